@@ -30,6 +30,10 @@ apiClient.interceptors.request.use(
 export const fetchProducts = () => apiClient.get('/api/products');
 export const fetchProductById = (id) => apiClient.get(`/api/products/${id}`);
 export const fetchCategories = () => apiClient.get('/api/categories');
+// Up to a few hundred products in one request, e.g. to refresh the cart
+export const fetchProductsBatch = (ids) => apiClient.post('/api/products/batch', { ids });
+// Current prices and a server-side total for [{ product_id, quantity }, ...]
+export const quoteCart = (items) => apiClient.post('/api/cart/quote', { items });
 
 // For creating products (which uses FormData)
 export const createProduct = (formData) => {
@@ -53,6 +57,8 @@ export const updateProduct = (id, formData) => {
   });
 };
 export const deleteProduct = (id) => apiClient.delete(`/api/products/${id}`);
+// { updates: [{ product_id, fields }] } or { price_rule: { percent, product_ids?, category_id? } }
+export const bulkUpdateProducts = (payload) => apiClient.post('/api/products/bulk-update', payload);
 
 export const registerUser = (userData) => apiClient.post('/api/auth/register', userData); 
 export const loginUser = (loginPayload) => { // loginPayload is URLSearchParams
@@ -67,7 +73,7 @@ export const createOrder = (checkoutData) => {
   // checkoutData will be a JSON object like the one tested in /docs
   return apiClient.post('/api/orders', checkoutData);
 };
-export const fetchOrders = () => apiClient.get('/api/orders');
+export const fetchOrders = (skip = 0, limit = 20) => apiClient.get('/api/orders', { params: { skip, limit } });
 export const fetchOrderById = (id) => apiClient.get(`/api/orders/${id}`);
 
 export const fetchCurrentUser = () => apiClient.get('/api/users/me');
@@ -1,6 +1,7 @@
 // frontend/src/stores/cart.js
 import { defineStore } from 'pinia';
 import { ref, computed } from 'vue';
+import { quoteCart } from '@/services/api';
 
 export const useCartStore = defineStore('cart', () => {
   // --- State ---
@@ -57,6 +58,26 @@ export const useCartStore = defineStore('cart', () => {
     // saveCartToLocalStorage();
   }
 
+  // Replace the stored product copies with current server data in one request.
+  // Products that no longer exist are dropped from the cart.
+  async function refreshProducts() {
+    if (items.value.length === 0) {
+      return null;
+    }
+    const response = await quoteCart(items.value.map(item => ({
+      product_id: item.product.id,
+      quantity: item.quantity
+    })));
+    const freshProducts = new Map(response.data.items.map(line => [line.product_id, line.product]));
+    items.value = items.value
+      .filter(item => freshProducts.has(item.product.id))
+      .map(item => ({ ...item, product: { ...freshProducts.get(item.product.id) } }));
+    if (response.data.missing_ids.length > 0) {
+      console.log(`Removed unavailable products from cart: ${response.data.missing_ids.join(', ')}`);
+    }
+    return response.data;
+  }
+
   // --- Optional: Persistence with localStorage ---
   // function saveCartToLocalStorage() {
   //   localStorage.setItem('shoppingCart', JSON.stringify(items.value));
@@ -85,6 +106,7 @@ export const useCartStore = defineStore('cart', () => {
     updateQuantity,
     removeItemFromCart,
     clearCart,
+    refreshProducts,
     cartItemCount,
     cartTotalPrice,
     // loadCartFromLocalStorage, // Expose if you want to call it from elsewhere too
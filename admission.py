@@ -0,0 +1,292 @@
+# ~/ecommerce-platform/admission.py
+# Admission control and load shedding for the API.
+#
+# Every /api request is classified into a route class (auth, checkout, search,
+# catalog, default). Each class has its own concurrency limit and a bounded,
+# priority-ordered wait queue with a deadline; a global limiter on top protects
+# the shared database pool. When a queue is full or a deadline passes, the
+# request gets an immediate 503 with Retry-After instead of piling up.
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+from jose import JWTError, jwt
+
+import auth
+
+# --- Priorities (lower number = admitted first) ---
+PRIORITY_CRITICAL = 0  # checkout and auth
+PRIORITY_NORMAL = 1    # signed-in browsing
+PRIORITY_LOW = 2       # anonymous browsing
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+# --- Configuration ---
+# (max concurrent, max queued, queue timeout seconds), overridable per class with
+# e.g. ADMISSION_CATALOG_LIMIT / ADMISSION_CATALOG_QUEUE / ADMISSION_CATALOG_TIMEOUT
+ROUTE_CLASS_DEFAULTS: Dict[str, Tuple[int, int, float]] = {
+    "auth": (16, 32, 5.0),
+    "checkout": (16, 32, 10.0),
+    "search": (8, 16, 1.0),
+    "catalog": (32, 64, 2.0),
+    "default": (16, 32, 5.0),
+}
+CRITICAL_ROUTE_CLASSES = {"auth", "checkout"}
+
+GLOBAL_LIMIT = _env_int("ADMISSION_GLOBAL_LIMIT", 64)
+# Slots of the global limit that only critical requests may use
+GLOBAL_RESERVED = _env_int("ADMISSION_GLOBAL_RESERVED", 8)
+GLOBAL_QUEUE = _env_int("ADMISSION_GLOBAL_QUEUE", 128)
+GLOBAL_TIMEOUT = _env_float("ADMISSION_GLOBAL_TIMEOUT", 5.0)
+RETRY_AFTER_SECONDS = _env_int("ADMISSION_RETRY_AFTER", 1)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() not in ("0", "false", "no")
+
+# Paths that are never limited (metrics must stay reachable under overload)
+UNLIMITED_PREFIXES = ("/api/metrics",)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, limiter: str, reason: str):
+        super().__init__(f"{limiter}: {reason}")
+        self.limiter = limiter
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """
+    Counting semaphore with a bounded priority wait queue.
+
+    Waiters are admitted most-critical first. When the queue is full, a newcomer
+    with a more critical priority evicts the least critical waiter instead of
+    being turned away. `reserved` slots are kept free for critical requests.
+    """
+
+    def __init__(self, name: str, capacity: int, max_queue: int, queue_timeout: float, reserved: int = 0):
+        self.name = name
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.reserved = min(reserved, max(capacity - 1, 0))
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        # Counters for metrics
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.shed = 0
+
+    def _has_slot(self, priority: int) -> bool:
+        limit = self.capacity if priority == PRIORITY_CRITICAL else self.capacity - self.reserved
+        return self.in_flight < limit
+
+    async def acquire(self, priority: int) -> None:
+        # Only jump the queue if nobody at least as important is already waiting
+        if self._has_slot(priority) and (not self._waiters or self._waiters[0][0] > priority):
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            worst = max(self._waiters) if self._waiters else None
+            if worst is None or worst[0] <= priority:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected(self.name, "queue_full")
+            # Make room by shedding the least important waiter
+            self._discard(worst)
+            self.shed += 1
+            worst[2].set_exception(AdmissionRejected(self.name, "shed"))
+
+        fut = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), fut)
+        heapq.heappush(self._waiters, entry)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(fut, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # On Python 3.12+ wait_for can time out even though release() handed
+            # us a slot in the same loop iteration; give it back or it leaks
+            self._give_back(entry, fut)
+            self.rejected_timeout += 1
+            raise AdmissionRejected(self.name, "timeout")
+        except asyncio.CancelledError:
+            # The client went away; give back a slot we may already have been handed
+            self._give_back(entry, fut)
+            raise
+
+    def _give_back(self, entry: Tuple[int, int, asyncio.Future], fut: asyncio.Future) -> None:
+        if fut.done() and not fut.cancelled() and fut.exception() is None:
+            self.release()
+        else:
+            self._discard(entry)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self._has_slot(self._waiters[0][0]):
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self.in_flight += 1
+            self.admitted += 1
+            fut.set_result(None)
+
+    def _discard(self, entry: Tuple[int, int, asyncio.Future]) -> None:
+        try:
+            self._waiters.remove(entry)
+        except ValueError:
+            return
+        heapq.heapify(self._waiters)
+
+    def snapshot(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "reserved": self.reserved,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "shed": self.shed,
+        }
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Map a request to its route class, or None if it is not admission-controlled."""
+    if not path.startswith("/api/") or path.startswith(UNLIMITED_PREFIXES):
+        return None
+    if path.startswith("/api/auth/"):
+        return "auth"
+    if path.rstrip("/") == "/api/cart/quote":
+        # Unauthenticated read fired on every cart page view, not a checkout
+        return "catalog"
+    if (path.rstrip("/") == "/api/orders" and method == "POST") or path.startswith("/api/cart/"):
+        return "checkout"
+    if path.startswith("/api/products/search"):
+        return "search"
+    if method == "GET" and (path.startswith("/api/products") or path.startswith("/api/categories")):
+        return "catalog"
+    if path == "/api/products/batch":
+        return "catalog"
+    return "default"
+
+
+def is_signed_in(headers) -> bool:
+    """True if the request carries a Bearer token with a valid signature and expiry."""
+    for name, value in headers:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return False
+            try:
+                jwt.decode(token.strip(), auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+            except JWTError:
+                return False
+            return True
+    return False
+
+
+class AdmissionController:
+    def __init__(self):
+        self.route_limiters: Dict[str, ConcurrencyLimiter] = {}
+        for route_class, (limit, queue, timeout) in ROUTE_CLASS_DEFAULTS.items():
+            prefix = f"ADMISSION_{route_class.upper()}"
+            self.route_limiters[route_class] = ConcurrencyLimiter(
+                route_class,
+                capacity=_env_int(f"{prefix}_LIMIT", limit),
+                max_queue=_env_int(f"{prefix}_QUEUE", queue),
+                queue_timeout=_env_float(f"{prefix}_TIMEOUT", timeout),
+            )
+        self.global_limiter = ConcurrencyLimiter(
+            "global", GLOBAL_LIMIT, GLOBAL_QUEUE, GLOBAL_TIMEOUT, reserved=GLOBAL_RESERVED
+        )
+
+    @staticmethod
+    def priority_for(route_class: str, authenticated: bool) -> int:
+        if route_class in CRITICAL_ROUTE_CLASSES:
+            return PRIORITY_CRITICAL
+        return PRIORITY_NORMAL if authenticated else PRIORITY_LOW
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "global": self.global_limiter.snapshot(),
+            "routes": {name: limiter.snapshot() for name, limiter in self.route_limiters.items()},
+        }
+
+
+class AdmissionControlMiddleware:
+    """Pure ASGI middleware so rejected requests never reach routing or the DB."""
+
+    def __init__(self, app, controller: "AdmissionController"):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        route_class = classify(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        authenticated = is_signed_in(scope["headers"])
+        priority = self.controller.priority_for(route_class, authenticated)
+        route_limiter = self.controller.route_limiters[route_class]
+        global_limiter = self.controller.global_limiter
+
+        try:
+            await route_limiter.acquire(priority)
+        except AdmissionRejected as rejected:
+            await self._reject(send, rejected, route_limiter)
+            return
+        try:
+            try:
+                await global_limiter.acquire(priority)
+            except AdmissionRejected as rejected:
+                await self._reject(send, rejected, global_limiter)
+                return
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                global_limiter.release()
+        finally:
+            route_limiter.release()
+
+    @staticmethod
+    async def _reject(send, rejected: AdmissionRejected, limiter: ConcurrencyLimiter) -> None:
+        retry_after = max(RETRY_AFTER_SECONDS, math.ceil(limiter.queue_timeout / 2))
+        body = json.dumps({
+            "detail": "Server is busy, please retry shortly.",
+            "limiter": rejected.limiter,
+            "reason": rejected.reason,
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Process-wide controller used by the API
+controller = AdmissionController()
@@ -0,0 +1,148 @@
+# ~/ecommerce-platform/archival.py
+# Hot/cold order archival: moves old orders in a terminal status from
+# orders / order_items into orders_archive / order_items_archive.
+#
+# Each chunk is its own short transaction (copy, then delete by primary key),
+# so the job never holds long locks on the hot tables and can be stopped and
+# restarted at any point. Run it from cron, or keep it running with --loop:
+#   python archival.py --older-than-days 365 --batch-size 500
+#   python archival.py --loop --interval 3600
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import DateTime, delete, insert, literal, select
+from sqlalchemy.orm import Session
+
+import database
+import models
+
+# --- Configuration ---
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# Orders in any other status (e.g. "pending") are never archived
+ARCHIVE_TERMINAL_STATUSES = [
+    s.strip() for s in os.getenv("ARCHIVE_TERMINAL_STATUSES", "delivered,completed,cancelled,refunded").split(",")
+    if s.strip()
+]
+# Pause between chunks so replication and other writers can keep up
+ARCHIVE_CHUNK_PAUSE_SECONDS = float(os.getenv("ARCHIVE_CHUNK_PAUSE_SECONDS", "0.1"))
+
+ORDER_COLUMNS = [
+    "id", "user_id", "total_price", "shipping_address_line1", "shipping_city",
+    "shipping_postal_code", "shipping_country", "status", "created_at", "updated_at",
+]
+ORDER_ITEM_COLUMNS = ["id", "order_id", "product_id", "quantity", "price_at_time_of_purchase"]
+
+
+def archive_chunk(
+    db: Session, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE, after_id: int = 0
+) -> Tuple[int, Optional[int]]:
+    """
+    Move one chunk of eligible orders with id > `after_id` to the archive.
+    Returns (orders moved, last candidate id). The last id is None once no
+    candidates are left; otherwise pass it as `after_id` for the next chunk. A
+    chunk can move 0 orders while candidates remain (all row-locked by other
+    transactions); those are skipped until the next run.
+    """
+    eligible = (
+        models.Order.created_at < cutoff,
+        models.Order.status.in_(ARCHIVE_TERMINAL_STATUSES),
+    )
+    # Find candidates through ix_orders_status_created without locking, then lock
+    # only those rows by primary key; a locking range scan would lock every row
+    # it walks past, including ones concurrent checkouts need.
+    candidate_ids = [
+        row.id for row in db.query(models.Order.id).filter(
+            models.Order.id > after_id, *eligible
+        ).order_by(models.Order.id).limit(batch_size)
+    ]
+    if not candidate_ids:
+        db.rollback()
+        return 0, None
+    last_id = candidate_ids[-1]
+    # Re-check the filter: a candidate may have changed or been archived meanwhile
+    order_ids: List[int] = [
+        row.id for row in db.query(models.Order.id).filter(
+            models.Order.id.in_(candidate_ids), *eligible
+        ).with_for_update(skip_locked=True)
+    ]
+    if not order_ids:
+        db.rollback()
+        return 0, last_id
+
+    archived_at = literal(datetime.utcnow(), type_=DateTime)
+    try:
+        db.execute(
+            insert(models.ArchivedOrder).from_select(
+                ORDER_COLUMNS + ["archived_at"],
+                select(*[getattr(models.Order, c) for c in ORDER_COLUMNS], archived_at)
+                .where(models.Order.id.in_(order_ids)),
+            )
+        )
+        db.execute(
+            insert(models.ArchivedOrderItem).from_select(
+                ORDER_ITEM_COLUMNS,
+                select(*[getattr(models.OrderItem, c) for c in ORDER_ITEM_COLUMNS])
+                .where(models.OrderItem.order_id.in_(order_ids)),
+            )
+        )
+        db.execute(delete(models.OrderItem).where(models.OrderItem.order_id.in_(order_ids)))
+        db.execute(delete(models.Order).where(models.Order.id.in_(order_ids)))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(order_ids), last_id
+
+
+def archive_orders(
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    max_chunks: Optional[int] = None,
+) -> int:
+    """Archive eligible orders chunk by chunk until none are left. Returns the total moved."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    total = 0
+    chunks = 0
+    last_id = 0
+    db = database.SessionLocal()
+    try:
+        while max_chunks is None or chunks < max_chunks:
+            moved, last_id = archive_chunk(db, cutoff, batch_size, after_id=last_id)
+            if last_id is None:
+                break
+            total += moved
+            chunks += 1
+            if moved:
+                print(f"Archived {moved} orders (total {total}).")
+            else:
+                print(f"Skipped a chunk of locked orders up to id {last_id}.")
+            time.sleep(ARCHIVE_CHUNK_PAUSE_SECONDS)
+    finally:
+        db.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old, closed orders into the archive tables.")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-chunks", type=int, default=None, help="Stop after this many chunks.")
+    parser.add_argument("--loop", action="store_true", help="Keep running, archiving every --interval seconds.")
+    parser.add_argument("--interval", type=int, default=3600)
+    args = parser.parse_args()
+
+    database.Base.metadata.create_all(bind=database.engine)
+    while True:
+        total = archive_orders(args.older_than_days, args.batch_size, args.max_chunks)
+        print(f"Archival run finished: {total} orders archived.")
+        if not args.loop:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,8 +17,10 @@ import models   # Correct direct import
 SECRET_KEY = os.getenv("SECRET_KEY", "XvhjdskjikdsjHJHDQSKLFJKLQJKHklds;:jqmhfdqkjkldjqlkkdhqkdjqkfqhiohdkbkk qhlkmhdkfhkqehihpyitttwdb")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# bcrypt work factor; only lower it for benchmarks and local testing
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
@@ -28,6 +30,14 @@ class TokenData(BaseModel):
     email: Optional[str] = None
 
 
+class TokenUser(BaseModel):
+    """The caller as described by their access token; no database row behind it."""
+    id: int
+    email: str
+    role: str
+    is_active: bool = True
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -45,9 +55,19 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def normalize_email(email: str) -> str:
+    """Canonical form used everywhere an email is stored, looked up or used as a cache key."""
+    return email.strip().lower()
+
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]: # Correctly type-hinted with models.User
     return db.query(models.User).filter(models.User.email == email).first()
 
+def get_login_row(db: Session, email: str):
+    """Only the columns login needs: (id, email, hashed_password, role, is_active), or None."""
+    return db.query(
+        models.User.id, models.User.email, models.User.hashed_password, models.User.role, models.User.is_active
+    ).filter(models.User.email == email).first()
+
 
 # --- Dependency to get current user ---
 async def get_current_user(
@@ -83,13 +103,48 @@ async def get_current_active_user(current_user: models.User = Depends(get_curren
     return current_user
 
 
-def require_admin(current_user: models.User = Depends(get_current_active_user)):
+# --- Dependency for endpoints that only need the caller's id, email and role ---
+async def get_token_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(database.get_db)
+) -> TokenUser:
+    """
+    Trusts the id and role embedded in the token, so no query is made. Role or
+    active-status changes take effect when the token expires. Tokens issued
+    before ids and roles were embedded fall back to a database lookup.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    email_from_token = payload.get("sub")
+    if email_from_token is None:
+        raise credentials_exception
+
+    user_id, role = payload.get("uid"), payload.get("role")
+    if user_id is not None and role is not None:
+        return TokenUser(id=user_id, email=email_from_token, role=role)
+
+    user = get_user_by_email(db, email=email_from_token)
+    if user is None:
+        raise credentials_exception
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+    return TokenUser(id=user.id, email=user.email, role=user.role, is_active=user.is_active)
+
+
+def require_admin(current_user: TokenUser = Depends(get_token_user)):
     
     if current_user.role != 'admin':
         raise HTTPException(status_code=403, detail="Admin privileges required.")
     return current_user
 
-def require_vendor_or_admin(current_user: models.User = Depends(get_current_active_user)):
+def require_vendor_or_admin(current_user: TokenUser = Depends(get_token_user)):
     
     if current_user.role not in ['vendor', 'admin']:
         raise HTTPException(status_code=403, detail="Vendor or Admin privileges required.")
@@ -0,0 +1,115 @@
+# ~/ecommerce-platform/benchmarks/bench_admission.py
+# Overload simulation for admission.ConcurrencyLimiter: admitted / shed /
+# timed-out counts under a burst, plus slot-accounting checks for the
+# shed, timeout and release-vs-deadline paths.
+#
+# Usage (from the project root):
+#   python benchmarks/bench_admission.py --requests 2000 --capacity 8
+#
+# Exits non-zero if any scenario ends with a leaked slot (in_flight != 0 once
+# every request has finished) or an unexpected outcome. Run it on Python 3.12+
+# too: the release-vs-deadline race only shows up with the newer wait_for.
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# admission imports auth (token checks), which needs a database URL but never connects here
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import admission  # noqa: E402
+
+failures = []
+
+
+def check(name: str, ok: bool, detail: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {name}: {detail}")
+    if not ok:
+        failures.append(name)
+
+
+async def request(limiter: admission.ConcurrencyLimiter, priority: int, work: float) -> str:
+    try:
+        await limiter.acquire(priority)
+    except admission.AdmissionRejected as rejected:
+        return rejected.reason
+    try:
+        await asyncio.sleep(work)
+    finally:
+        limiter.release()
+    return "admitted"
+
+
+async def release_at_deadline() -> None:
+    """release() hands the slot over in the same loop iteration as the waiter's deadline."""
+    limiter = admission.ConcurrencyLimiter("race", capacity=1, max_queue=4, queue_timeout=0.05)
+    await limiter.acquire(admission.PRIORITY_NORMAL)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    # Block the loop past both timers so they fire in one iteration, release first
+    loop.call_at(start + 0.01, time.sleep, 0.1)
+    loop.call_at(start + 0.049, limiter.release)
+    outcome = await request(limiter, admission.PRIORITY_NORMAL, 0)
+    check("release at deadline", limiter.in_flight == 0,
+          f"waiter got '{outcome}', in_flight={limiter.in_flight}")
+
+
+async def shed_and_timeout() -> None:
+    limiter = admission.ConcurrencyLimiter("paths", capacity=1, max_queue=2, queue_timeout=0.2)
+    holder = asyncio.create_task(request(limiter, admission.PRIORITY_CRITICAL, 0.5))
+    await asyncio.sleep(0)
+    low = [asyncio.create_task(request(limiter, admission.PRIORITY_LOW, 0)) for _ in range(2)]
+    await asyncio.sleep(0)
+    # Queue is full of low-priority waiters: a critical newcomer sheds one of them
+    critical = asyncio.create_task(request(limiter, admission.PRIORITY_CRITICAL, 0))
+    await asyncio.sleep(0)
+    # ...and another low-priority one is turned away outright
+    rejected = await request(limiter, admission.PRIORITY_LOW, 0)
+    outcomes = Counter(await asyncio.gather(holder, critical, *low))
+    outcomes[rejected] += 1
+    expected = Counter({"admitted": 1, "shed": 1, "queue_full": 1, "timeout": 2})
+    check("shed / queue_full / timeout", outcomes == expected and limiter.in_flight == 0,
+          f"{dict(outcomes)}, in_flight={limiter.in_flight}")
+
+
+async def burst(requests: int, rate: float, capacity: int, max_queue: int, timeout: float, seed: int) -> None:
+    """Poisson arrivals at `rate`/s, each holding a slot for 1-20 ms."""
+    rng = random.Random(seed)
+    limiter = admission.ConcurrencyLimiter("burst", capacity, max_queue, timeout, reserved=1)
+    priorities = [admission.PRIORITY_CRITICAL, admission.PRIORITY_NORMAL, admission.PRIORITY_LOW]
+    tasks = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        priority = rng.choices(priorities, weights=[1, 3, 6])[0]
+        tasks.append(asyncio.create_task(request(limiter, priority, rng.uniform(0.001, 0.02))))
+        await asyncio.sleep(rng.expovariate(rate))
+    outcomes = Counter(await asyncio.gather(*tasks))
+    elapsed = time.perf_counter() - start
+    check("burst", limiter.in_flight == 0 and not limiter._waiters,
+          f"{dict(outcomes)} in {elapsed:.2f}s, in_flight={limiter.in_flight}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate overload against the admission limiter.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=2000, help="arrivals per second")
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--queue", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"Python {sys.version.split()[0]}")
+    asyncio.run(release_at_deadline())
+    asyncio.run(shed_and_timeout())
+    asyncio.run(burst(args.requests, args.rate, args.capacity, args.queue, args.timeout, args.seed))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# ~/ecommerce-platform/benchmarks/bench_auth.py
+# Registrations/sec and logins/sec for a single worker, plus SQL statements
+# per request, driven through the real endpoints in-process.
+#
+# Usage (from the project root):
+#   python benchmarks/bench_auth.py --users 500 --bcrypt-rounds 4
+#
+# bcrypt dominates both flows at the production cost (12 rounds), so a low
+# --bcrypt-rounds shows the database round-trips instead. Runs against a
+# throwaway SQLite file unless BENCH_DATABASE_URL points at a scratch MySQL
+# schema. Never point it at real data; the users table is emptied first.
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)  # main.py mounts ./static relative to the working directory
+
+BENCH_DB_PATH = ROOT / "bench_auth.db"
+
+
+def configure(bcrypt_rounds: int) -> None:
+    # Must happen before the app modules are imported
+    os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{BENCH_DB_PATH}")
+    os.environ["BCRYPT_ROUNDS"] = str(bcrypt_rounds)
+    os.environ["LOGIN_IP_LIMIT"] = str(10 ** 9)
+    os.environ["LOGIN_ACCOUNT_LIMIT"] = str(10 ** 9)
+    os.environ["INVALIDATION_TRANSPORT"] = "db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark registration and login throughput.")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4, help="bcrypt cost (production uses 12).")
+    args = parser.parse_args()
+    configure(args.bcrypt_rounds)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    import database
+    import main as app_main
+    import models
+
+    statements = 0
+
+    def count_statement(*_):
+        nonlocal statements
+        statements += 1
+
+    with database.engine.begin() as conn:
+        conn.execute(models.CacheInvalidation.__table__.delete())
+        conn.execute(models.User.__table__.delete())
+    event.listen(database.engine, "before_cursor_execute", count_statement)
+    client = TestClient(app_main.app)
+    emails = [f"bench{i}@example.com" for i in range(args.users)]
+
+    statements = 0
+    start = time.perf_counter()
+    for email in emails:
+        response = client.post("/api/auth/register", json={"email": email, "password": "benchmark-pw"})
+        assert response.status_code == 200, response.text
+    elapsed = time.perf_counter() - start
+    print(f"register: {args.users / elapsed:8.1f} req/s  {statements / args.users:.1f} SQL statements/request")
+
+    statements = 0
+    start = time.perf_counter()
+    for email in emails:
+        response = client.post("/api/auth/login", data={"username": email, "password": "benchmark-pw"})
+        assert response.status_code == 200, response.text
+    elapsed = time.perf_counter() - start
+    print(f"login:    {args.users / elapsed:8.1f} req/s  {statements / args.users:.1f} SQL statements/request")
+
+    token = response.json()["access_token"]
+    statements = 0
+    for _ in range(100):
+        client.get("/api/orders", headers={"Authorization": f"Bearer {token}"})
+    print(f"GET /api/orders with the new token: {statements / 100:.1f} SQL statements/request")
+    print(f"(bcrypt rounds: {args.bcrypt_rounds}, database: {database.engine.url.render_as_string(hide_password=True)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# ~/ecommerce-platform/benchmarks/bench_compression.py
+# Bytes-on-wire and CPU per request for catalog JSON: uncompressed vs.
+# on-the-fly compression vs. the precompressed catalog cache.
+#
+# Usage (from the project root):
+#   python benchmarks/bench_compression.py --products 500 --requests 200
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import compression  # noqa: E402
+
+
+def catalog_payload(products: int, seed: int) -> bytes:
+    """JSON shaped like GET /api/products (Product schema with nested owner)."""
+    rng = random.Random(seed)
+    words = ["organic", "cotton", "shirt", "blue", "wireless", "headphones", "leather",
+             "wallet", "steel", "bottle", "ceramic", "mug", "running", "shoes", "desk", "lamp"]
+    rows = []
+    for product_id in range(1, products + 1):
+        owner_id = rng.randint(1, 40)
+        rows.append({
+            "name": " ".join(rng.choices(words, k=3)).title(),
+            "description": " ".join(rng.choices(words, k=rng.randint(8, 30))),
+            "price": round(rng.uniform(2, 400), 2),
+            "image_url": f"/static_images/products/item_{product_id}_{rng.getrandbits(32):08x}.png",
+            "category_id": rng.randint(1, 12),
+            "id": product_id,
+            "owner": {"id": owner_id, "full_name": f"Vendor {owner_id}", "email": f"vendor{owner_id}@example.com"},
+        })
+    return json.dumps(rows).encode()
+
+
+def measure(label: str, fn, requests: int, raw_size: int) -> None:
+    start = time.process_time()
+    size = 0
+    for _ in range(requests):
+        size = len(fn())
+    cpu_ms = (time.process_time() - start) * 1000 / requests
+    print(f"{label:<28} {size:>10,} B  {100 * size / raw_size:6.1f}%  {cpu_ms:8.3f} ms CPU/request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark catalog response compression.")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    body = catalog_payload(args.products, args.seed)
+    headers = [(b"content-type", b"application/json")]
+    print(f"Catalog of {args.products} products, {len(body):,} bytes uncompressed; "
+          f"encodings available: {', '.join(compression.AVAILABLE_ENCODINGS)}\n")
+
+    measure("identity", lambda: body, args.requests, len(body))
+    for encoding in compression.AVAILABLE_ENCODINGS:
+        fast, high = compression.LEVELS[encoding]
+        measure(f"{encoding} on-the-fly level {fast}",
+                lambda: compression.compress(body, encoding, fast), args.requests, len(body))
+        measure(f"{encoding} on-the-fly level {high}",
+                lambda: compression.compress(body, encoding, high), args.requests, len(body))
+        # The first request pays for compression (in a worker thread), the rest are dictionary lookups
+        entry = compression.CachedResponse(200, headers, body, generation=0)
+        asyncio.run(entry.encode(encoding))
+        measure(f"{encoding} precompressed cache",
+                lambda: entry.variant(encoding)[1], args.requests, len(body))
+
+
+if __name__ == "__main__":
+    main()
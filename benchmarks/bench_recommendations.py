@@ -0,0 +1,109 @@
+# ~/ecommerce-platform/benchmarks/bench_recommendations.py
+# Times a full rebuild of the co-occurrence index over synthetic order lines.
+#
+# Usage (from the project root):
+#   python benchmarks/bench_recommendations.py --lines 1000000
+#
+# By default this runs against a throwaway SQLite file; set BENCH_DATABASE_URL
+# to point it at a scratch MySQL schema instead. Never point it at real data,
+# order_items and order_items_archive are truncated first.
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+BENCH_DB_PATH = ROOT / "bench_recommendations.db"
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{BENCH_DB_PATH}")
+
+import database  # noqa: E402  (DATABASE_URL must be set first)
+import models  # noqa: E402
+import recommendations  # noqa: E402
+
+INSERT_BATCH = 50_000
+
+
+def seed_order_lines(lines: int, products: int, max_basket: int, seed: int) -> int:
+    """Insert `lines` synthetic order lines; returns the number of orders."""
+    rng = random.Random(seed)
+    # A skewed popularity curve so some products co-occur far more often
+    weights = [1.0 / (rank + 1) for rank in range(products)]
+    product_ids = list(range(1, products + 1))
+
+    table = models.OrderItem.__table__
+    with database.engine.begin() as conn:
+        conn.execute(table.delete())
+
+    batch = []
+    order_id = 0
+    written = 0
+    while written < lines:
+        order_id += 1
+        basket = min(rng.randint(1, max_basket), lines - written)
+        for product_id in set(rng.choices(product_ids, weights=weights, k=basket)):
+            batch.append({
+                "order_id": order_id,
+                "product_id": product_id,
+                "quantity": 1,
+                "price_at_time_of_purchase": 10.0,
+            })
+            written += 1
+        if len(batch) >= INSERT_BATCH:
+            with database.engine.begin() as conn:
+                conn.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        with database.engine.begin() as conn:
+            conn.execute(table.insert(), batch)
+    return order_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark co-occurrence index rebuilds.")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--max-basket", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Only the line tables are needed (the archive stays empty); foreign keys are
+    # not enforced by SQLite.
+    models.OrderItem.__table__.create(bind=database.engine, checkfirst=True)
+    models.ArchivedOrderItem.__table__.create(bind=database.engine, checkfirst=True)
+    with database.engine.begin() as conn:
+        conn.execute(models.ArchivedOrderItem.__table__.delete())
+
+    start = time.perf_counter()
+    orders = seed_order_lines(args.lines, args.products, args.max_basket, args.seed)
+    print(f"Seeded {args.lines:,} order lines across {orders:,} orders "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    index = recommendations.CoOccurrenceIndex()
+    timings = []
+    for _ in range(args.repeat):
+        db = database.SessionLocal()
+        try:
+            start = time.perf_counter()
+            pairs = index.rebuild(db)
+            timings.append(time.perf_counter() - start)
+        finally:
+            db.close()
+
+    print(f"Rebuild: {pairs:,} product pairs, "
+          f"best {min(timings):.2f}s / mean {sum(timings) / len(timings):.2f}s over {args.repeat} runs")
+
+    start = time.perf_counter()
+    lookups = 100_000
+    for i in range(lookups):
+        index.related(1 + i % args.products)
+    elapsed = time.perf_counter() - start
+    print(f"Lookup: {lookups / elapsed:,.0f} related() calls/s")
+
+
+if __name__ == "__main__":
+    main()
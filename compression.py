@@ -0,0 +1,345 @@
+# ~/ecommerce-platform/compression.py
+# Negotiated response compression (zstd / brotli / gzip) and a cache of
+# precompressed catalog responses.
+#
+# brotli and zstandard are optional: if either package is missing, that
+# encoding is simply never offered and gzip (stdlib) is used instead.
+import asyncio
+import gzip
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# --- Configuration ---
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "30"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "512"))
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+# (fast level, high level) per encoding. The high level is used when the
+# machine is idle and for cached entries, which are only compressed once.
+LEVELS: Dict[str, Tuple[int, int]] = {
+    "zstd": (1, 10),
+    "br": (1, 9),
+    "gzip": (1, 6),
+}
+# Server preference when the client accepts several encodings equally
+PREFERENCE = ["zstd", "br", "gzip"]
+
+AVAILABLE_ENCODINGS = [
+    name for name in PREFERENCE
+    if name == "gzip" or (name == "br" and brotli) or (name == "zstd" and zstandard)
+]
+
+# Load per CPU above which on-the-fly compression drops to the fast level
+HIGH_LOAD_THRESHOLD = float(os.getenv("COMPRESSION_HIGH_LOAD", "0.7"))
+_LOAD_SAMPLE_INTERVAL = 1.0
+_cpu_count = os.cpu_count() or 1
+_load_sample = (0.0, 0.0)  # (sampled at, load per cpu)
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick the best available encoding for an Accept-Encoding header, or None."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            weights[token] = q
+
+    best, best_q = None, 0.0
+    for name in AVAILABLE_ENCODINGS:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def _load_per_cpu() -> float:
+    global _load_sample
+    now = time.monotonic()
+    sampled_at, load = _load_sample
+    if now - sampled_at >= _LOAD_SAMPLE_INTERVAL:
+        try:
+            load = os.getloadavg()[0] / _cpu_count
+        except (AttributeError, OSError):  # not available on Windows
+            load = 0.0
+        _load_sample = (now, load)
+    return load
+
+
+def dynamic_level(encoding: str) -> int:
+    """Compression level for on-the-fly responses, lowered when CPU is busy."""
+    fast, high = LEVELS[encoding]
+    return fast if _load_per_cpu() >= HIGH_LOAD_THRESHOLD else high
+
+
+def is_compressible(headers: List[Tuple[bytes, bytes]], body_size: int) -> bool:
+    if body_size < COMPRESSION_MIN_SIZE:
+        return False
+    content_type = b""
+    for name, value in headers:
+        if name == b"content-encoding":
+            return False
+        if name == b"content-type":
+            content_type = value
+    return content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+
+
+class CachedResponse:
+    """
+    A response body kept alongside each encoded variant, compressed once on
+    demand. Variants use the high level, so they are compressed in a worker
+    thread rather than stalling every request on the event loop.
+    """
+
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes, generation: int):
+        self.status = status
+        self.headers = [(k, v) for k, v in headers if k not in (b"content-length", b"content-encoding", b"vary")]
+        self.body = body
+        self.generation = generation
+        self.created_at = time.monotonic()
+        self.compressible = is_compressible(headers, len(body))
+        self._variants: Dict[str, bytes] = {}
+        self._pending: Dict[str, "asyncio.Future[bytes]"] = {}
+
+    def variant(self, encoding: Optional[str]) -> Optional[Tuple[Optional[str], bytes]]:
+        """The (encoding, body) to send, or None if that variant is not compressed yet."""
+        if encoding is None or not self.compressible:
+            return None, self.body
+        encoded = self._variants.get(encoding)
+        return None if encoded is None else (encoding, encoded)
+
+    async def encode(self, encoding: Optional[str]) -> Tuple[Optional[str], bytes]:
+        ready = self.variant(encoding)
+        if ready is not None:
+            return ready
+        # Concurrent requests for the same missing variant share one compression
+        pending = self._pending.get(encoding)
+        if pending is None:
+            pending = asyncio.ensure_future(
+                asyncio.to_thread(compress, self.body, encoding, LEVELS[encoding][1])
+            )
+            self._pending[encoding] = pending
+        try:
+            # Shielded so one client disconnecting does not cancel it for the others
+            encoded = await asyncio.shield(pending)
+        finally:
+            if pending.done():
+                self._pending.pop(encoding, None)
+        self._variants[encoding] = encoded
+        return encoding, encoded
+
+
+class CatalogResponseCache:
+    """
+    Per-process LRU of public catalog responses, evicted through the
+    invalidation bus (see invalidation.py). The generation counter stops a
+    request that started before an eviction from storing its (now stale)
+    response afterwards.
+    """
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL_SECONDS, max_entries: int = CATALOG_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry.created_at > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        if entry.generation != self.generation:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def evict(self, paths=(), prefixes=()) -> None:
+        """Drop entries for exact `paths` and for any path under `prefixes` (query strings ignored)."""
+        self.generation += 1
+        self.invalidations += 1
+        for key in list(self._entries):
+            path = key.partition("?")[0]
+            if path in paths or path.startswith(tuple(prefixes)):
+                del self._entries[key]
+
+    def evict_product(self, product_id: Optional[int] = None) -> None:
+        """A product changed: evict the list and its detail page (all details if no id)."""
+        if product_id is None:
+            self.evict(paths=("/api/products",), prefixes=("/api/products/",))
+        else:
+            self.evict(paths=("/api/products", f"/api/products/{product_id}"))
+
+    def evict_categories(self) -> None:
+        self.evict(paths=("/api/categories",))
+
+    def snapshot(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "stored_bytes": sum(
+                len(e.body) + sum(len(v) for v in e._variants.values()) for e in self._entries.values()
+            ),
+        }
+
+
+def catalog_cache_key(scope) -> Optional[str]:
+    """Cache key for a public catalog read, or None if the request must not be cached."""
+    if scope["method"] != "GET":
+        return None
+    path = scope["path"].rstrip("/")
+    parts = path.split("/")
+    cacheable = (
+        path in ("/api/products", "/api/categories")
+        or (len(parts) == 4 and path.startswith("/api/products/") and parts[3].isdigit())
+    )
+    if not cacheable:
+        return None
+    query = scope.get("query_string", b"").decode("latin-1")
+    return f"{path}?{query}" if query else path
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware: serves catalog reads from the precompressed cache and
+    compresses other /api JSON responses on the fly. Static files pass through.
+    """
+
+    def __init__(self, app, cache: "CatalogResponseCache", stats: "CompressionStats"):
+        self.app = app
+        self.cache = cache
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding)
+
+        key = catalog_cache_key(scope)
+        if key is not None:
+            entry = self.cache.get(key)
+            if entry is not None:
+                await self._send_entry(send, entry, encoding)
+                return
+        generation = self.cache.generation
+
+        start_message = None
+        chunks = []
+
+        async def buffered_send(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            entry = CachedResponse(start_message["status"], list(start_message.get("headers", [])), body, generation)
+            if key is not None and entry.status == 200:
+                self.cache.put(key, entry)
+                await self._send_entry(send, entry, encoding)
+            elif encoding and entry.compressible:
+                encoded = compress(body, encoding, dynamic_level(encoding))
+                await self._send(send, entry.status, entry.headers, encoding, encoded, len(body))
+            else:
+                await self._send(send, entry.status, start_message.get("headers", []), None, body, len(body), raw=True)
+
+        await self.app(scope, receive, buffered_send)
+
+    async def _send_entry(self, send, entry: CachedResponse, encoding: Optional[str]) -> None:
+        used, body = await entry.encode(encoding)
+        await self._send(send, entry.status, entry.headers, used, body, len(entry.body))
+
+    async def _send(self, send, status_code, headers, encoding, body, original_size, raw=False):
+        self.stats.bytes_in += original_size
+        self.stats.bytes_out += len(body)
+        if raw:
+            out_headers = list(headers)
+        else:
+            out_headers = list(headers) + [
+                (b"content-length", str(len(body)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            if encoding:
+                out_headers.append((b"content-encoding", encoding.encode()))
+                self.stats.compressed_responses += 1
+        await send({"type": "http.response.start", "status": status_code, "headers": out_headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+class CompressionStats:
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compressed_responses = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "available_encodings": AVAILABLE_ENCODINGS,
+            "min_size": COMPRESSION_MIN_SIZE,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "compressed_responses": self.compressed_responses,
+        }
+
+
+# Process-wide cache and counters used by the API
+catalog_cache = CatalogResponseCache()
+stats = CompressionStats()
@@ -0,0 +1,193 @@
+# ~/ecommerce-platform/invalidation.py
+# Cross-worker cache invalidation bus.
+#
+# Write endpoints call `bus.publish(db, topic, key)` before committing. With
+# the default DB transport the event is a row in cache_invalidations written
+# in the same transaction as the change, so it exists if and only if the
+# change committed. After commit the publishing worker evicts locally right
+# away; every other worker (and host) picks the row up from its poller.
+#
+# Transports are pluggable: set INVALIDATION_TRANSPORT=local for a single
+# process, or implement InvalidationTransport for e.g. a message broker.
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Set
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+import database
+import models
+
+# --- Configuration ---
+INVALIDATION_TRANSPORT = os.getenv("INVALIDATION_TRANSPORT", "db")
+INVALIDATION_POLL_INTERVAL = float(os.getenv("INVALIDATION_POLL_INTERVAL", "1.0"))
+INVALIDATION_RETENTION_SECONDS = int(os.getenv("INVALIDATION_RETENTION_SECONDS", "3600"))
+# Auto-increment ids can commit out of order, so each poll re-reads this many
+# ids below the highest one seen and skips the ones already applied.
+INVALIDATION_LOOKBACK_IDS = int(os.getenv("INVALIDATION_LOOKBACK_IDS", "500"))
+INVALIDATION_FETCH_LIMIT = 1000
+_PRUNE_EVERY_POLLS = 60
+
+# Key meaning "everything under this topic"
+ALL = "*"
+_PENDING_KEY = "pending_invalidations"
+
+
+class InvalidationEvent(NamedTuple):
+    topic: str
+    key: str
+
+
+class InvalidationTransport:
+    """How events travel between workers. Subclasses override what they need."""
+
+    def stage(self, db: Session, events: List[InvalidationEvent], origin: str) -> None:
+        """Called before commit, inside the writer's transaction."""
+
+    def send(self, events: List[InvalidationEvent], origin: str) -> None:
+        """Called after a successful commit."""
+
+    def fetch(self, origin: str) -> List[InvalidationEvent]:
+        """Return events published by other workers since the last call."""
+        return []
+
+
+class LocalTransport(InvalidationTransport):
+    """Single-process deployments: local dispatch is all that is needed."""
+
+
+class DatabaseTransport(InvalidationTransport):
+    """Change-log table polled by every worker; needs no extra service."""
+
+    def __init__(self):
+        self.high_water: Optional[int] = None
+        self._seen: Set[int] = set()
+        self._polls = 0
+
+    def stage(self, db: Session, events: List[InvalidationEvent], origin: str) -> None:
+        for evt in events:
+            db.add(models.CacheInvalidation(topic=evt.topic, entity_key=evt.key, origin=origin))
+
+    def fetch(self, origin: str) -> List[InvalidationEvent]:
+        db = database.SessionLocal()
+        try:
+            if self.high_water is None:
+                # Caches start empty, so history before startup is irrelevant
+                self.high_water = db.query(func.max(models.CacheInvalidation.id)).scalar() or 0
+                return []
+
+            low_water = max(self.high_water - INVALIDATION_LOOKBACK_IDS, 0)
+            rows = db.query(
+                models.CacheInvalidation.id,
+                models.CacheInvalidation.topic,
+                models.CacheInvalidation.entity_key,
+                models.CacheInvalidation.origin,
+            ).filter(models.CacheInvalidation.id > low_water).order_by(
+                models.CacheInvalidation.id
+            ).limit(INVALIDATION_FETCH_LIMIT + len(self._seen)).all()
+
+            events = []
+            for row in rows:
+                if row.id in self._seen:
+                    continue
+                self._seen.add(row.id)
+                self.high_water = max(self.high_water, row.id)
+                if row.origin != origin:
+                    events.append(InvalidationEvent(row.topic, row.entity_key))
+            new_low_water = max(self.high_water - INVALIDATION_LOOKBACK_IDS, 0)
+            self._seen = {i for i in self._seen if i > new_low_water}
+
+            self._polls += 1
+            if self._polls % _PRUNE_EVERY_POLLS == 0:
+                self._prune(db)
+            return events
+        finally:
+            db.close()
+
+    @staticmethod
+    def _prune(db: Session) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=INVALIDATION_RETENTION_SECONDS)
+        try:
+            db.query(models.CacheInvalidation).filter(
+                models.CacheInvalidation.created_at < cutoff
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error pruning cache invalidation log: {e}")
+
+
+class InvalidationBus:
+    def __init__(self, transport: InvalidationTransport):
+        self.transport = transport
+        self.origin = str(uuid.uuid4())
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self.published = 0
+        self.received = 0
+
+    def subscribe(self, topic: str, handler: Callable[[str], None]) -> None:
+        """`handler(key)` is called with an entity key, or ALL for the whole topic."""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, db: Session, topic: str, key=ALL) -> None:
+        """Queue an event on `db`; it is delivered only if the transaction commits."""
+        evt = InvalidationEvent(topic, str(key))
+        db.info.setdefault(_PENDING_KEY, []).append(evt)
+        self.transport.stage(db, [evt], self.origin)
+
+    def dispatch(self, events: List[InvalidationEvent]) -> None:
+        for evt in events:
+            for handler in self._handlers.get(evt.topic, []):
+                try:
+                    handler(evt.key)
+                except Exception as e:
+                    print(f"Error handling invalidation {evt.topic}:{evt.key}: {e}")
+
+    def _after_commit(self, session: Session) -> None:
+        events = session.info.pop(_PENDING_KEY, None)
+        if events:
+            self.published += len(events)
+            self.dispatch(events)
+            self.transport.send(events, self.origin)
+
+    def _after_rollback(self, session: Session) -> None:
+        session.info.pop(_PENDING_KEY, None)
+
+    async def run_poller(self, interval: float = INVALIDATION_POLL_INTERVAL) -> None:
+        """Poll the transport forever; handlers run on the event loop thread."""
+        while True:
+            try:
+                events = await asyncio.to_thread(self.transport.fetch, self.origin)
+                self.received += len(events)
+                self.dispatch(events)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error polling cache invalidations: {e}")
+            await asyncio.sleep(interval)
+
+    def snapshot(self) -> dict:
+        return {
+            "transport": type(self.transport).__name__,
+            "origin": self.origin,
+            "published": self.published,
+            "received": self.received,
+            "topics": sorted(self._handlers),
+        }
+
+
+def make_transport(name: str = INVALIDATION_TRANSPORT) -> InvalidationTransport:
+    if name == "db":
+        return DatabaseTransport()
+    if name == "local":
+        return LocalTransport()
+    raise ValueError(f"Unknown INVALIDATION_TRANSPORT: {name}")
+
+
+# Process-wide bus used by the API
+bus = InvalidationBus(make_transport())
+event.listen(database.SessionLocal, "after_commit", bus._after_commit)
+event.listen(database.SessionLocal, "after_rollback", bus._after_rollback)
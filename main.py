@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import status
 from pydantic import BaseModel
@@ -10,14 +10,25 @@ from datetime import datetime
 
 import shutil  
 import os
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 
+from sqlalchemy import insert, update, case, func, literal
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 
 
 import models
 import database
 import auth
+import recommendations
+import admission
+import compression
+import invalidation
+import outbox
+import throttling
+import outbox_handlers  # noqa: F401  (registers outbox handlers so enqueue() knows them)
 
 # --- Configuration ---
 UPLOAD_DIR = Path("static/images/products")
@@ -49,6 +60,54 @@ class Product(ProductBase):
     class Config:
         from_attributes = True 
 
+# --- Schemas for vendor bulk updates ---
+class ProductBulkFields(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    category_id: Optional[int] = None
+
+class ProductBulkItem(BaseModel):
+    product_id: int
+    fields: ProductBulkFields
+
+class PriceRule(BaseModel): # e.g. {"percent": -10} for a 10% discount
+    percent: float
+    product_ids: Optional[List[int]] = None
+    category_id: Optional[int] = None
+
+class ProductBulkUpdate(BaseModel): # Exactly one of updates / price_rule
+    updates: Optional[List[ProductBulkItem]] = None
+    price_rule: Optional[PriceRule] = None
+
+class ProductBulkResult(BaseModel):
+    product_id: int
+    status: str # "updated", "not_found", "forbidden", "skipped" (outside the rule's category) or "invalid_category"
+
+class ProductBulkUpdateResult(BaseModel):
+    updated: int
+    results: List[ProductBulkResult]
+
+# --- Schemas for batch lookups and cart quotes ---
+class ProductBatchRequest(BaseModel):
+    ids: List[int]
+
+class ProductBatch(BaseModel):
+    products: List[Product]
+    missing_ids: List[int]
+
+class CartQuoteItem(BaseModel):
+    product_id: int
+    quantity: int
+    unit_price: float
+    line_total: float
+    product: Product
+
+class CartQuote(BaseModel):
+    items: List[CartQuoteItem]
+    missing_ids: List[int]
+    total_price: float
+
 class CategoryBase(BaseModel):
     name: str
 
@@ -105,6 +164,9 @@ class OrderItemBase(BaseModel):
 class OrderItemCreate(OrderItemBase):
     pass
 
+class CartQuoteRequest(BaseModel):
+    items: List[OrderItemCreate]
+
 class ProductInOrder(BaseModel):
     id: int
     name: str
@@ -154,17 +216,57 @@ except Exception as e:
    
 
 
+# --- Cache Invalidation Subscriptions ---
+# Every worker evicts its own caches when any worker publishes a change.
+def _on_product_changed(key: str):
+    compression.catalog_cache.evict_product(None if key == invalidation.ALL else int(key))
+
+def _on_category_changed(key: str):
+    compression.catalog_cache.evict_categories()
+
+def _on_user_changed(key: str):
+    # Product responses embed the owner's name and email
+    compression.catalog_cache.evict_product(None)
+
+invalidation.bus.subscribe("product", _on_product_changed)
+invalidation.bus.subscribe("category", _on_category_changed)
+invalidation.bus.subscribe("user", _on_user_changed)
+invalidation.bus.subscribe("user_email", throttling.unknown_emails.discard)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    poller = asyncio.create_task(invalidation.bus.run_poller())
+    rebuilder = asyncio.create_task(recommendations.index.run_rebuilder())
+    try:
+        yield
+    finally:
+        poller.cancel()
+        rebuilder.cancel()
+
+
 # --- FastAPI Application Instance ---
 app = FastAPI(
     title="E-commerce API with MySQL",
     description="API for managing products, orders, etc. for an e-commerce platform.",
     version="0.3.0", 
+    lifespan=lifespan,
 )
 
 # --- Static Files Mounting ---
 
 app.mount("/static_images", StaticFiles(directory="static/images"), name="static_images")
 
+# --- Admission Control ---
+# Added before CORS so CORS stays outermost and 503s still carry CORS headers.
+app.add_middleware(admission.AdmissionControlMiddleware, controller=admission.controller)
+
+# --- Response Compression ---
+# Sits outside admission control so cached catalog hits never take a slot.
+app.add_middleware(
+    compression.CompressionMiddleware, cache=compression.catalog_cache, stats=compression.stats
+)
+
 # --- CORS Middleware ---
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
@@ -184,6 +286,35 @@ app.add_middleware(
 )
 
 
+# Order history page size (default and maximum)
+ORDER_HISTORY_PAGE_SIZE = int(os.getenv("ORDER_HISTORY_PAGE_SIZE", "20"))
+ORDER_HISTORY_MAX_PAGE_SIZE = 100
+# Upper bound on ids accepted by the batch lookup and cart quote endpoints
+PRODUCT_BATCH_MAX_IDS = int(os.getenv("PRODUCT_BATCH_MAX_IDS", "300"))
+# Bulk updates: max rows per request, and rows per UPDATE statement
+PRODUCT_BULK_MAX_ITEMS = int(os.getenv("PRODUCT_BULK_MAX_ITEMS", "5000"))
+PRODUCT_BULK_CHUNK_SIZE = 500
+
+
+# --- Helper Function for Batch Product Lookups ---
+def fetch_products_in_order(db: Session, product_ids: List[int]):
+    """
+    Load products with one IN query (owner and category eager-loaded) and return
+    them in the order requested, de-duplicated, plus the ids that were not found.
+    """
+    unique_ids = list(dict.fromkeys(product_ids))
+    if not unique_ids:
+        return [], []
+    db_products = db.query(models.Product).options(
+        joinedload(models.Product.category),
+        joinedload(models.Product.owner)
+    ).filter(models.Product.id.in_(unique_ids)).all()
+    product_map = {p.id: p for p in db_products}
+    found = [product_map[pid] for pid in unique_ids if pid in product_map]
+    missing_ids = [pid for pid in unique_ids if pid not in product_map]
+    return found, missing_ids
+
+
 # --- Helper Function for Image Saving ---
 def save_upload_file(upload_file: UploadFile, destination_dir: Path) -> Optional[str]:
     if not upload_file:
@@ -209,50 +340,87 @@ def save_upload_file(upload_file: UploadFile, destination_dir: Path) -> Optional
 # --- API Endpoints ---
 @app.post("/api/auth/register", response_model=User)
 async def register_user(user_input: UserCreate, db: Session = Depends(database.get_db)):
-    db_user = auth.get_user_by_email(db, email=user_input.email)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
     # Validate role
     if user_input.role not in ['customer', 'vendor']:
         raise HTTPException(status_code=400, detail="Invalid role specified. Must be 'customer' or 'vendor'.")
 
+    email = auth.normalize_email(user_input.email)
     hashed_password = auth.get_password_hash(user_input.password)
-    db_user_model = models.User(
-        email=user_input.email,
-        hashed_password=hashed_password,
-        full_name=user_input.full_name,
-        role=user_input.role # <-- SET THE ROLE FROM INPUT
-    )
-    # ... (rest of your existing try/except block to save user)
+    # Insert straight away and let the unique index on email reject duplicates,
+    # instead of a SELECT first and a refresh afterwards.
     try:
-        db.add(db_user_model)
+        result = db.execute(insert(models.User).values(
+            email=email,
+            hashed_password=hashed_password,
+            full_name=user_input.full_name,
+            role=user_input.role,
+            is_active=True,
+        ))
+        # The email may be in every worker's unknown-email cache
+        invalidation.bus.publish(db, "user_email", throttling.email_key(email))
         db.commit()
-        db.refresh(db_user_model)
-        return db_user_model
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Email already registered")
     except Exception as e:
         db.rollback()
+        print(f"Error registering user: {e}")
         raise HTTPException(status_code=500, detail="Could not register user.")
+
+    return {
+        "id": result.inserted_primary_key[0],
+        "email": email,
+        "full_name": user_input.full_name,
+        "is_active": True,
+        "role": user_input.role,
+    }
     
 
 @app.post("/api/auth/login", response_model=Token) # Or name it /api/auth/token
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(), # Expects x-www-form-urlencoded data
     db: Session = Depends(database.get_db)
 ):
-    user = auth.get_user_by_email(db, email=form_data.username) # form_data.username is the email
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    login_failed = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Incorrect email or password",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    # form_data.username is the email; the same normalized value is throttled,
+    # looked up and negative-cached
+    email = auth.normalize_email(form_data.username)
+
+    # Throttle before any DB or bcrypt work
+    retry_after = throttling.check_login_allowed(email, throttling.client_ip(request))
+    if retry_after is not None:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password",
-            headers={"WWW-Authenticate": "Bearer"},
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Please try again later.",
+            headers={"Retry-After": str(retry_after)},
         )
+    email_key = throttling.email_key(email)
+    if email_key in throttling.unknown_emails:
+        raise login_failed
+
+    user = auth.get_login_row(db, email=email)
+    if not user:
+        throttling.unknown_emails.add(email_key)
+        raise login_failed
+    if not auth.verify_password(form_data.password, user.hashed_password):
+        raise login_failed
+    if not user.is_active:
+        # Tokens are trusted without a lookup, so inactive users must not get one
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+    throttling.account_limiter.reset(email_key)
     
     # Create JWT token
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    # Store user's email (or ID) in the "sub" (subject) field of the token
+    # "sub" holds the email; id and role let later requests skip the user lookup
     access_token = auth.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "uid": user.id, "role": user.role},
+        expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -260,21 +428,48 @@ async def login_for_access_token(
 
 @app.get("/api/orders", response_model=List[Order]) 
 async def get_user_orders(
+    skip: int = 0,
+    limit: int = ORDER_HISTORY_PAGE_SIZE,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: auth.TokenUser = Depends(auth.get_token_user)
 ):   
-  
-    user_orders = db.query(models.Order).options(
+    """
+    One page of the current user's orders, newest first. Recent orders come
+    from the hot table; archived orders follow and are only queried when the
+    hot table cannot fill the requested page.
+    """
+    skip = max(skip, 0)
+    limit = min(limit, ORDER_HISTORY_MAX_PAGE_SIZE)
+    if limit <= 0:
+        return []
+
+    hot_query = db.query(models.Order).options(
         joinedload(models.Order.items).joinedload(models.OrderItem.product) # Eager load items and their products
-    ).filter(models.Order.user_id == current_user.id).order_by(models.Order.created_at.desc()).all()
-    return user_orders
+    ).filter(models.Order.user_id == current_user.id).order_by(models.Order.created_at.desc(), models.Order.id.desc())
+    user_orders = hot_query.offset(skip).limit(limit).all()
+    if len(user_orders) >= limit:
+        return user_orders
+
+    # Hot table ran out: continue into the archive
+    if user_orders or skip == 0:
+        archive_skip = 0
+    else:
+        hot_total = db.query(models.Order.id).filter(models.Order.user_id == current_user.id).count()
+        archive_skip = max(skip - hot_total, 0)
+    remaining = limit - len(user_orders)
+    archived_orders = db.query(models.ArchivedOrder).options(
+        joinedload(models.ArchivedOrder.items).joinedload(models.ArchivedOrderItem.product)
+    ).filter(models.ArchivedOrder.user_id == current_user.id).order_by(
+        models.ArchivedOrder.created_at.desc(), models.ArchivedOrder.id.desc()
+    ).offset(archive_skip).limit(remaining).all()
+    return user_orders + archived_orders
 
 
 @app.get("/api/orders/{order_id}", response_model=Order) 
 async def get_user_order_details(
     order_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: auth.TokenUser = Depends(auth.get_token_user)
 ):
     """
     Retrieve the details of a specific order, ensuring it belongs to the current user.
@@ -286,6 +481,15 @@ async def get_user_order_details(
         models.Order.user_id == current_user.id
     ).first()
 
+    if db_order is None:
+        # Old, closed orders live in the archive (see archival.py)
+        db_order = db.query(models.ArchivedOrder).options(
+            joinedload(models.ArchivedOrder.items).joinedload(models.ArchivedOrderItem.product)
+        ).filter(
+            models.ArchivedOrder.id == order_id,
+            models.ArchivedOrder.user_id == current_user.id
+        ).first()
+
     if db_order is None:
        
         raise HTTPException(status_code=404, detail=f"Order with ID {order_id} not found.")
@@ -297,7 +501,7 @@ async def get_user_order_details(
 async def create_new_order(
     order_input: OrderCreate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_active_user) # Require user to be logged in
+    current_user: auth.TokenUser = Depends(auth.get_token_user) # Require user to be logged in
 ):
     """
     Create a new order from cart items and shipping details.
@@ -355,11 +559,21 @@ async def create_new_order(
         # 4. Associate the OrderItems with the new Order
         new_order.items.extend(order_items_to_create)
 
-        # 5. Add to session and commit the transaction
+        # 5. Add to session and record post-order side effects in the same transaction
         db.add(new_order)
+        db.flush() # Assigns the order id for the outbox payload
+        outbox.enqueue(db, "order.created", {
+            "order_id": new_order.id,
+            "user_id": current_user.id,
+            "total_price": total_price,
+            "product_ids": product_ids,
+        })
         db.commit()
         db.refresh(new_order) # Refresh to get the new order ID and relationships loaded
 
+        # 6. Fold the committed order into the "bought together" index
+        recommendations.index.record_order(product_ids)
+
         return new_order
 
     except HTTPException:
@@ -392,6 +606,8 @@ async def update_current_user_details(
 
     if not user_data_to_update:
         raise HTTPException(status_code=400, detail="No update data provided.")
+    if user_data_to_update.get("email") is not None:
+        user_data_to_update["email"] = auth.normalize_email(user_data_to_update["email"])
 
     updated_fields_count = 0
     for key, value in user_data_to_update.items():
@@ -406,6 +622,8 @@ async def update_current_user_details(
 
     try:
         db.add(current_user) # SQLAlchemy tracks changes on the current_user object
+        invalidation.bus.publish(db, "user", current_user.id)
+        invalidation.bus.publish(db, "user_email", throttling.email_key(auth.normalize_email(current_user.email)))
         db.commit()
         db.refresh(current_user)
         
@@ -421,6 +639,35 @@ async def update_current_user_details(
         # Be careful about exposing too much detail from DB errors (e.g., unique constraint violation if email was updated)
         raise HTTPException(status_code=500, detail="Could not update user profile.")
 
+@app.get("/api/metrics/admission")
+async def get_admission_metrics():
+    """
+    Current admission-control state: per route class and global in-flight,
+    queue depth and rejection counters, for tuning the limits.
+    """
+    return admission.controller.snapshot()
+
+@app.get("/api/metrics/compression")
+async def get_compression_metrics():
+    """
+    Bytes before/after compression and precompressed catalog cache stats.
+    """
+    return {**compression.stats.snapshot(), "catalog_cache": compression.catalog_cache.snapshot()}
+
+@app.get("/api/metrics/invalidation")
+async def get_invalidation_metrics():
+    """
+    Cache invalidation bus state for this worker.
+    """
+    return invalidation.bus.snapshot()
+
+@app.get("/api/metrics/login-throttling")
+async def get_login_throttling_metrics():
+    """
+    Login limiter settings, rejection counters and unknown-email cache size.
+    """
+    return throttling.snapshot()
+
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to the E-commerce API with MySQL! Visit /docs for API documentation."}
@@ -432,7 +679,7 @@ async def create_new_product(
     description: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.require_vendor_or_admin)
+    current_user: auth.TokenUser = Depends(auth.require_vendor_or_admin)
 ):
     print(f"Product created by user: {current_user.email}")
     image_url_to_save: Optional[str] = None
@@ -457,6 +704,8 @@ async def create_new_product(
 
     try:
         db.add(db_product)
+        db.flush() # Assigns the id for the invalidation event
+        invalidation.bus.publish(db, "product", db_product.id)
         db.commit()
         db.refresh(db_product)
         return db_product
@@ -512,6 +761,224 @@ async def search_products(query: str, db: Session = Depends(database.get_db)):
 # ... (your existing GET /api/products, GET /api/products/{id}, POST, PUT, DELETE endpoints) ...
 
 
+@app.post("/api/products/batch", response_model=ProductBatch)
+async def get_products_batch(batch_input: ProductBatchRequest, db: Session = Depends(database.get_db)):
+    """
+    Fetch many products in one query, e.g. to refresh a cart. Products come back
+    in request order; ids that do not exist are listed in `missing_ids`.
+    """
+    if len(batch_input.ids) > PRODUCT_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {PRODUCT_BATCH_MAX_IDS} product IDs per request.")
+    try:
+        products, missing_ids = fetch_products_in_order(db, batch_input.ids)
+    except Exception as e:
+        print(f"Error fetching product batch: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred while fetching products.")
+    return {"products": products, "missing_ids": missing_ids}
+
+
+@app.post("/api/cart/quote", response_model=CartQuote)
+async def quote_cart(quote_input: CartQuoteRequest, db: Session = Depends(database.get_db)):
+    """
+    Price a cart with current product data and a server-side total, so the client
+    can show up-to-date prices before checkout without reloading the catalog.
+    """
+    cart_items = quote_input.items
+    if len(cart_items) > PRODUCT_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {PRODUCT_BATCH_MAX_IDS} cart items per request.")
+    if any(item.quantity <= 0 for item in cart_items):
+        raise HTTPException(status_code=400, detail="Item quantities must be positive.")
+    try:
+        products, missing_ids = fetch_products_in_order(db, [item.product_id for item in cart_items])
+    except Exception as e:
+        print(f"Error quoting cart: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred while pricing the cart.")
+
+    product_map = {p.id: p for p in products}
+    quote_items = []
+    total_price = 0
+    for item in cart_items:
+        product = product_map.get(item.product_id)
+        if product is None:
+            continue
+        line_total = product.price * item.quantity
+        total_price += line_total
+        quote_items.append({
+            "product_id": product.id,
+            "quantity": item.quantity,
+            "unit_price": product.price,
+            "line_total": line_total,
+            "product": product,
+        })
+    return {"items": quote_items, "missing_ids": missing_ids, "total_price": total_price}
+
+
+
+@app.post("/api/products/bulk-update", response_model=ProductBulkUpdateResult)
+async def bulk_update_products(
+    bulk_input: ProductBulkUpdate,
+    db: Session = Depends(database.get_db),
+    current_user: auth.TokenUser = Depends(auth.require_vendor_or_admin)
+):
+    """
+    Update many products in one transaction, either with per-product field
+    values or with a percentage price rule. Vendors can only touch their own
+    products; admins are unscoped. Returns a status for every product id.
+    """
+    if (bulk_input.updates is None) == (bulk_input.price_rule is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'updates' or 'price_rule'.")
+
+    is_admin = current_user.role == 'admin'
+    print(f"Bulk product update by user: {current_user.email}")
+
+    try:
+        if bulk_input.updates is not None:
+            results = _apply_bulk_field_updates(db, bulk_input.updates, current_user, is_admin)
+        else:
+            results = _apply_price_rule(db, bulk_input.price_rule, current_user, is_admin)
+        if any(r["status"] == "updated" for r in results):
+            # Once per batch, not once per row
+            invalidation.bus.publish(db, "product", invalidation.ALL)
+        db.commit()
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        print(f"Error during bulk product update: {e}")
+        raise HTTPException(status_code=500, detail="Could not update products.")
+
+    updated = sum(1 for r in results if r["status"] == "updated")
+    return {"updated": updated, "results": results}
+
+
+def _lock_owned_products(db: Session, product_ids: List[int]):
+    """Lock the target rows for this transaction and return {id: owner_id}."""
+    rows = db.query(models.Product.id, models.Product.owner_id).filter(
+        models.Product.id.in_(product_ids)
+    ).with_for_update().all()
+    return {row.id: row.owner_id for row in rows}
+
+
+def _classify_bulk_targets(product_ids: List[int], owners, current_user: auth.TokenUser, is_admin: bool):
+    results, allowed = [], []
+    for pid in product_ids:
+        if pid not in owners:
+            results.append({"product_id": pid, "status": "not_found"})
+        elif not is_admin and owners[pid] != current_user.id:
+            results.append({"product_id": pid, "status": "forbidden"})
+        else:
+            results.append({"product_id": pid, "status": "updated"})
+            allowed.append(pid)
+    return results, allowed
+
+
+def _scoped_product_update(ids: List[int], current_user: auth.TokenUser, is_admin: bool):
+    stmt = update(models.Product).where(models.Product.id.in_(ids))
+    if not is_admin:
+        stmt = stmt.where(models.Product.owner_id == current_user.id)
+    return stmt.execution_options(synchronize_session=False)
+
+
+def _apply_bulk_field_updates(db: Session, items: List[ProductBulkItem], current_user: auth.TokenUser, is_admin: bool):
+    if len(items) > PRODUCT_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {PRODUCT_BULK_MAX_ITEMS} products per request.")
+    fields_by_id = {}
+    for item in items:
+        if item.product_id in fields_by_id:
+            raise HTTPException(status_code=400, detail=f"Duplicate product_id {item.product_id} in updates.")
+        fields = item.fields.model_dump(exclude_unset=True)
+        if not fields:
+            raise HTTPException(status_code=400, detail=f"No fields to update for product {item.product_id}.")
+        if fields.get("name", "") is None or fields.get("price", 0) is None:
+            raise HTTPException(status_code=400, detail=f"Name and price cannot be null (product {item.product_id}).")
+        if fields.get("price", 0) < 0:
+            raise HTTPException(status_code=400, detail=f"Price cannot be negative (product {item.product_id}).")
+        fields_by_id[item.product_id] = fields
+
+    product_ids = list(fields_by_id)
+    owners = _lock_owned_products(db, product_ids)
+    results, allowed = _classify_bulk_targets(product_ids, owners, current_user, is_admin)
+
+    # Unknown category ids are reported per product instead of failing the whole batch on the FK
+    new_categories = {pid: fields_by_id[pid]["category_id"] for pid in allowed if fields_by_id[pid].get("category_id") is not None}
+    if new_categories:
+        known_categories = {
+            row.id for row in db.query(models.Category.id).filter(models.Category.id.in_(set(new_categories.values())))
+        }
+        invalid = {pid for pid, category_id in new_categories.items() if category_id not in known_categories}
+        if invalid:
+            allowed = [pid for pid in allowed if pid not in invalid]
+            for result in results:
+                if result["product_id"] in invalid:
+                    result["status"] = "invalid_category"
+
+    # One UPDATE per chunk: each column becomes CASE id WHEN ... THEN ... ELSE column END
+    for start in range(0, len(allowed), PRODUCT_BULK_CHUNK_SIZE):
+        chunk = allowed[start:start + PRODUCT_BULK_CHUNK_SIZE]
+        columns = {name for pid in chunk for name in fields_by_id[pid]}
+        values = {}
+        for name in columns:
+            column = getattr(models.Product, name)
+            whens = [
+                (models.Product.id == pid, literal(fields_by_id[pid][name], type_=column.type))
+                for pid in chunk if name in fields_by_id[pid]
+            ]
+            values[name] = case(*whens, else_=column)
+        db.execute(_scoped_product_update(chunk, current_user, is_admin).values(**values))
+    return results
+
+
+def _apply_price_rule(db: Session, rule: PriceRule, current_user: auth.TokenUser, is_admin: bool):
+    if rule.percent <= -100:
+        raise HTTPException(status_code=400, detail="A price rule cannot reduce prices by 100% or more.")
+
+    if rule.product_ids is not None:
+        if len(rule.product_ids) > PRODUCT_BULK_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"At most {PRODUCT_BULK_MAX_ITEMS} products per request.")
+        product_ids = list(dict.fromkeys(rule.product_ids))
+        owners = _lock_owned_products(db, product_ids)
+        results, allowed = _classify_bulk_targets(product_ids, owners, current_user, is_admin)
+        if rule.category_id is not None and allowed:
+            in_category = {
+                row.id for row in db.query(models.Product.id).filter(
+                    models.Product.id.in_(allowed), models.Product.category_id == rule.category_id
+                )
+            }
+            allowed = [pid for pid in allowed if pid in in_category]
+            for result in results:
+                if result["status"] == "updated" and result["product_id"] not in in_category:
+                    result["status"] = "skipped"
+    else:
+        # No explicit ids: every product in scope (optionally within one category)
+        if is_admin and rule.category_id is None:
+            raise HTTPException(status_code=400, detail="Admins must scope a price rule with 'product_ids' or 'category_id'.")
+        query = db.query(models.Product.id)
+        if not is_admin:
+            query = query.filter(models.Product.owner_id == current_user.id)
+        if rule.category_id is not None:
+            query = query.filter(models.Product.category_id == rule.category_id)
+        allowed = [
+            row.id for row in query.order_by(models.Product.id).limit(PRODUCT_BULK_MAX_ITEMS + 1).with_for_update()
+        ]
+        if len(allowed) > PRODUCT_BULK_MAX_ITEMS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"The price rule matches more than {PRODUCT_BULK_MAX_ITEMS} products; narrow it with 'product_ids' or 'category_id'.",
+            )
+        results = [{"product_id": pid, "status": "updated"} for pid in allowed]
+
+    factor = 1 + rule.percent / 100
+    for start in range(0, len(allowed), PRODUCT_BULK_CHUNK_SIZE):
+        chunk = allowed[start:start + PRODUCT_BULK_CHUNK_SIZE]
+        db.execute(
+            _scoped_product_update(chunk, current_user, is_admin).values(
+                price=func.round(models.Product.price * factor, 2)
+            )
+        )
+    return results
+
+
 @app.get("/api/products", response_model=List[Product])
 async def get_all_products(db: Session = Depends(database.get_db)):
     try:
@@ -535,6 +1002,22 @@ async def get_one_product(product_id: int, db: Session = Depends(database.get_db
     return db_product
 
 
+@app.get("/api/products/{product_id}/related", response_model=List[Product])
+async def get_related_products(
+    product_id: int,
+    limit: int = recommendations.RECOMMENDATIONS_TOP_K,
+    db: Session = Depends(database.get_db)
+):
+    """
+    "Frequently bought together" products for a product, served from the
+    precomputed co-occurrence index. Empty until the startup build finishes.
+    """
+    related_ids = recommendations.index.related(product_id, limit=max(limit, 0))
+    # Keeps the index's ranking; products deleted since the last rebuild drop out
+    related_products, _ = fetch_products_in_order(db, related_ids)
+    return related_products
+
+
 @app.put("/api/products/{product_id}", response_model=Product)
 async def update_one_product(
     product_id: int,
@@ -543,7 +1026,7 @@ async def update_one_product(
     price: Optional[float] = Form(None),
     image: Optional[UploadFile] = File(None),
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.require_vendor_or_admin)
+    current_user: auth.TokenUser = Depends(auth.require_vendor_or_admin)
 ):
     print(f"Product updated by user: {current_user.email}")
     db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
@@ -586,6 +1069,7 @@ async def update_one_product(
     
     try:
         db.add(db_product) # or just db.flush() if only updating existing, then db.commit()
+        invalidation.bus.publish(db, "product", product_id)
         db.commit()
         db.refresh(db_product)
 
@@ -617,7 +1101,7 @@ async def update_one_product(
 async def delete_one_product(
     product_id: int, 
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.require_vendor_or_admin)
+    current_user: auth.TokenUser = Depends(auth.require_vendor_or_admin)
     ):
 
     print(f"Product deleted by user: {current_user.email}")
@@ -636,7 +1120,9 @@ async def delete_one_product(
 
     try:
         db.delete(db_product)
+        invalidation.bus.publish(db, "product", product_id)
         db.commit()
+        recommendations.index.remove_product(product_id)
         
         if image_path_to_delete and image_path_to_delete.exists():
             try:
@@ -662,7 +1148,7 @@ async def get_all_categories(db: Session = Depends(database.get_db)):
 async def create_new_category(
     category_input: CategoryCreate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.require_admin)
+    current_user: auth.TokenUser = Depends(auth.require_admin)
 ):
   
     # Optional: Check if category already exists
@@ -672,6 +1158,8 @@ async def create_new_category(
 
     new_category = models.Category(name=category_input.name)
     db.add(new_category)
+    db.flush()
+    invalidation.bus.publish(db, "category", new_category.id)
     db.commit()
     db.refresh(new_category)
     return new_category
@@ -1,5 +1,5 @@
 # ~/ecommerce-platform/models.py
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import database
@@ -52,6 +52,8 @@ class Product(database.Base):
 
 class Order(database.Base):
     __tablename__ = "orders"
+    # Lets the archival job find old, closed orders without scanning the table
+    __table_args__ = (Index("ix_orders_status_created", "status", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -80,4 +82,80 @@ class OrderItem(database.Base):
     price_at_time_of_purchase = Column(Float, nullable=False)
 
     order = relationship("Order", back_populates="items")
-    product = relationship("Product")
\ No newline at end of file
+    product = relationship("Product")
+
+
+# --- Archive tables for closed, old orders (see archival.py) ---
+# Same columns as orders / order_items; ids are kept so archived orders keep their URLs.
+class ArchivedOrder(database.Base):
+    __tablename__ = "orders_archive"
+    __table_args__ = (Index("ix_orders_archive_user_created", "user_id", "created_at"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    total_price = Column(Float, nullable=False)
+
+    shipping_address_line1 = Column(String(255), nullable=False)
+    shipping_city = Column(String(100), nullable=False)
+    shipping_postal_code = Column(String(20), nullable=False)
+    shipping_country = Column(String(100), nullable=False)
+
+    status = Column(String(50), nullable=False)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, nullable=False)
+
+    items = relationship("ArchivedOrderItem", back_populates="order")
+    user = relationship("User")
+
+
+class ArchivedOrderItem(database.Base):
+    __tablename__ = "order_items_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    order_id = Column(Integer, ForeignKey("orders_archive.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    price_at_time_of_purchase = Column(Float, nullable=False)
+
+    order = relationship("ArchivedOrder", back_populates="items")
+    product = relationship("Product")
+
+
+# --- Change log behind the cache invalidation bus (see invalidation.py) ---
+class CacheInvalidation(database.Base):
+    __tablename__ = "cache_invalidations"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    topic = Column(String(50), nullable=False)
+    entity_key = Column(String(64), nullable=False) # Entity id, or "*" for the whole topic
+    origin = Column(String(36), nullable=False)     # Worker that published the event
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+# --- Transactional outbox for post-commit side effects (see outbox.py) ---
+class OutboxEvent(database.Base):
+    __tablename__ = "outbox_events"
+    __table_args__ = (Index("ix_outbox_events_status_available", "status", "available_at"),)
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    event_type = Column(String(100), nullable=False)
+    handler = Column(String(100), nullable=False) # One row per registered handler
+    payload = Column(Text, nullable=False)        # JSON
+    status = Column(String(20), default="pending", nullable=False) # pending, processing, done, dead
+    attempts = Column(Integer, default=0, nullable=False)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+
+# --- Counters maintained by the outbox worker (see outbox_handlers.py) ---
+class ProductPopularity(database.Base):
+    __tablename__ = "product_popularity"
+
+    # No FK: counters may outlive a deleted product and must never block its deletion
+    product_id = Column(Integer, primary_key=True, autoincrement=False)
+    order_count = Column(Integer, default=0, nullable=False)
+    units_sold = Column(Integer, default=0, nullable=False)
+    last_ordered_at = Column(DateTime, nullable=True)
@@ -0,0 +1,144 @@
+# ~/ecommerce-platform/outbox.py
+# Transactional outbox: side effects of a write (confirmation emails,
+# analytics, counters, ...) are recorded as outbox_events rows in the same
+# transaction as the write, then carried out by a separate worker process.
+#
+# Handlers are registered per event type (see outbox_handlers.py). Each
+# handler gets its own row, so one failing side effect is retried, backed off
+# and eventually dead-lettered without re-running the others. The worker
+# process lives in outbox_worker.py.
+import json
+import os
+import random
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+import models
+
+# --- Configuration ---
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "5"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+# A claimed event that is not finished within the lease is picked up again
+# (e.g. the worker crashed mid-batch)
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+
+Handler = Callable[[Session, dict], None]
+
+# event type -> {handler name: handler}
+HANDLERS: Dict[str, Dict[str, Handler]] = {}
+
+
+def register(event_type: str, name: Optional[str] = None):
+    """Decorator: run the function for every `event_type` event, as `fn(db, payload)`."""
+    def decorator(fn: Handler) -> Handler:
+        HANDLERS.setdefault(event_type, {})[name or fn.__name__] = fn
+        return fn
+    return decorator
+
+
+def enqueue(db: Session, event_type: str, payload: dict) -> None:
+    """
+    Add one outbox row per registered handler to the caller's session. Nothing
+    is committed here: the rows are saved (or discarded) with the caller's
+    transaction.
+    """
+    body = json.dumps(payload, default=str)
+    for handler_name in HANDLERS.get(event_type, {}):
+        db.add(models.OutboxEvent(event_type=event_type, handler=handler_name, payload=body))
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter (50-100% of the step), capped at OUTBOX_BACKOFF_MAX_SECONDS."""
+    ceiling = min(OUTBOX_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)), OUTBOX_BACKOFF_MAX_SECONDS)
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def claim_batch(db: Session, batch_size: int = OUTBOX_BATCH_SIZE) -> List[models.OutboxEvent]:
+    """
+    Lease up to `batch_size` due events. The claim is committed right away so
+    no lock is held while handlers run; SKIP LOCKED lets several workers drain
+    the same table. Each claim counts as an attempt, so an event whose handler
+    keeps crashing or hanging the worker (its lease expires every time) is
+    dead-lettered like any other failure.
+    """
+    now = datetime.utcnow()
+    candidates = db.query(models.OutboxEvent).filter(
+        or_(models.OutboxEvent.status == "pending", models.OutboxEvent.status == "processing"),
+        models.OutboxEvent.available_at <= now,
+    ).order_by(models.OutboxEvent.id).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    lease_until = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+    events = []
+    for evt in candidates:
+        if evt.status == "processing" and evt.attempts >= OUTBOX_MAX_ATTEMPTS:
+            evt.status = "dead"
+            evt.last_error = evt.last_error or "Lease expired on the final attempt"
+            print(f"Outbox event {evt.id} ({evt.event_type}/{evt.handler}) dead-lettered: {evt.last_error}")
+            continue
+        evt.attempts += 1
+        evt.status = "processing"
+        evt.available_at = lease_until
+        events.append(evt)
+    db.commit()
+    return events
+
+
+def process_event(db: Session, evt: models.OutboxEvent) -> bool:
+    """Run one event's handler and record the outcome. Returns True on success."""
+    handler = HANDLERS.get(evt.event_type, {}).get(evt.handler)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler '{evt.handler}' registered for '{evt.event_type}'")
+        handler(db, json.loads(evt.payload))
+        evt.status = "done"
+        evt.processed_at = datetime.utcnow()
+        evt.last_error = None
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        # attempts was already counted when the event was claimed
+        evt.last_error = "".join(traceback.format_exception_only(type(e), e)).strip()[:2000]
+        if evt.attempts >= OUTBOX_MAX_ATTEMPTS:
+            evt.status = "dead"
+            print(f"Outbox event {evt.id} ({evt.event_type}/{evt.handler}) dead-lettered: {evt.last_error}")
+        else:
+            evt.status = "pending"
+            evt.available_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(evt.attempts))
+        db.commit()
+        return False
+
+
+def drain_once(db: Session, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Claim and process one batch. Returns the number of events handled."""
+    events = claim_batch(db, batch_size)
+    for evt in events:
+        process_event(db, evt)
+    return len(events)
+
+
+def prune(db: Session, retention_days: int = OUTBOX_RETENTION_DAYS) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = db.query(models.OutboxEvent).filter(
+        models.OutboxEvent.status == "done",
+        models.OutboxEvent.processed_at < cutoff,
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def requeue_dead(db: Session) -> int:
+    requeued = db.query(models.OutboxEvent).filter(models.OutboxEvent.status == "dead").update(
+        {"status": "pending", "attempts": 0, "available_at": datetime.utcnow()},
+        synchronize_session=False,
+    )
+    db.commit()
+    return requeued
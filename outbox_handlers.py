@@ -0,0 +1,45 @@
+# ~/ecommerce-platform/outbox_handlers.py
+# Side effects run by the outbox worker. To add one, register a function for
+# the event type here; the code that enqueues the event does not change.
+#
+# A handler's writes are committed in the same transaction that marks its
+# outbox row done, so a failed attempt leaves nothing half-applied.
+#
+# Event payloads:
+#   "order.created": {"order_id", "user_id", "total_price", "product_ids"}
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+import outbox
+
+
+@outbox.register("order.created")
+def update_product_popularity(db: Session, payload: dict) -> None:
+    """Bump per-product order and unit counters (e.g. for ranking search results)."""
+    units_by_product = dict(
+        db.query(models.OrderItem.product_id, func.sum(models.OrderItem.quantity))
+        .filter(models.OrderItem.order_id == payload["order_id"])
+        .group_by(models.OrderItem.product_id)
+        .all()
+    )
+    if not units_by_product:
+        # Archived or deleted before we got to it; nothing to count
+        return
+
+    now = datetime.utcnow()
+    counters = {
+        row.product_id: row for row in db.query(models.ProductPopularity).filter(
+            models.ProductPopularity.product_id.in_(units_by_product)
+        ).with_for_update()
+    }
+    for product_id, units in units_by_product.items():
+        counter = counters.get(product_id)
+        if counter is None:
+            counter = models.ProductPopularity(product_id=product_id, order_count=0, units_sold=0)
+            db.add(counter)
+        counter.order_count += 1
+        counter.units_sold += int(units)
+        counter.last_ordered_at = now
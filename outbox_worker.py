@@ -0,0 +1,67 @@
+# ~/ecommerce-platform/outbox_worker.py
+# Worker process that drains the transactional outbox (see outbox.py).
+#
+#   python outbox_worker.py                  # drain forever
+#   python outbox_worker.py --once           # drain what is due, then exit
+#   python outbox_worker.py --requeue-dead   # give dead-lettered events another go
+#
+# Several workers can run side by side; claims use SELECT ... SKIP LOCKED.
+import argparse
+import time
+
+import database
+import outbox
+import outbox_handlers  # noqa: F401  (registers the handlers)
+
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+def run_worker(once: bool = False, batch_size: int = outbox.OUTBOX_BATCH_SIZE,
+               poll_interval: float = outbox.OUTBOX_POLL_INTERVAL) -> None:
+    last_prune = 0.0
+    db = database.SessionLocal()
+    try:
+        while True:
+            try:
+                handled = outbox.drain_once(db, batch_size)
+                if time.monotonic() - last_prune > PRUNE_INTERVAL_SECONDS:
+                    outbox.prune(db)
+                    last_prune = time.monotonic()
+            except Exception as e:
+                db.rollback()
+                print(f"Error draining outbox: {e}")
+                handled = 0
+            if handled == 0:
+                if once:
+                    break
+                # Caught up: wait for new events instead of spinning
+                time.sleep(poll_interval)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process transactional outbox events.")
+    parser.add_argument("--once", action="store_true", help="Exit once no events are due.")
+    parser.add_argument("--batch-size", type=int, default=outbox.OUTBOX_BATCH_SIZE)
+    parser.add_argument("--poll-interval", type=float, default=outbox.OUTBOX_POLL_INTERVAL)
+    parser.add_argument("--requeue-dead", action="store_true",
+                        help="Move dead-lettered events back to pending and exit.")
+    args = parser.parse_args()
+
+    database.Base.metadata.create_all(bind=database.engine)
+    if args.requeue_dead:
+        db = database.SessionLocal()
+        try:
+            print(f"Requeued {outbox.requeue_dead(db)} dead-lettered events.")
+        finally:
+            db.close()
+        return
+
+    handlers = {event_type: sorted(names) for event_type, names in outbox.HANDLERS.items()}
+    print(f"Outbox worker started with handlers: {handlers}")
+    run_worker(once=args.once, batch_size=args.batch_size, poll_interval=args.poll_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# ~/ecommerce-platform/recommendations.py
+# "Frequently bought together" recommendations built from order co-occurrence.
+#
+# Each worker keeps its own index: it is built off the event loop at startup,
+# folds in the orders that worker commits, and is rebuilt periodically so
+# orders taken by other workers (and hosts) are picked up too.
+import asyncio
+import os
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, aliased
+
+import database
+import models
+
+# --- Configuration ---
+RECOMMENDATIONS_TOP_K = int(os.getenv("RECOMMENDATIONS_TOP_K", "10"))
+RECOMMENDATIONS_REBUILD_INTERVAL = float(os.getenv("RECOMMENDATIONS_REBUILD_INTERVAL", "900"))
+REBUILD_FETCH_SIZE = 10_000
+
+
+class CoOccurrenceIndex:
+    """
+    Sparse item-item matrix of "bought in the same order" counts, plus a
+    precomputed top-k list per product so lookups never touch the database.
+    """
+
+    def __init__(self, top_k: int = RECOMMENDATIONS_TOP_K):
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._matrix: Dict[int, Dict[int, int]] = {}
+        self._top: Dict[int, List[int]] = {}
+        self._dirty: Set[int] = set()
+        # Orders recorded while a rebuild is reading the database; replayed onto
+        # the new matrix so they are not lost when it replaces the old one
+        self._replay: Optional[List[Set[int]]] = None
+        self.built = False
+
+    def rebuild(self, db: Session) -> int:
+        """
+        Recompute the whole matrix from hot and archived order lines. The pair
+        counting is a self-join + GROUP BY in the database, so Python only ever
+        sees one row per (product, related product) pair and table. Returns the pair count.
+        """
+        with self._lock:
+            self._replay = []
+        try:
+            matrix, pairs = self._read_pairs(db)
+            top = {product_id: self._top_k_for(row) for product_id, row in matrix.items()}
+        except Exception:
+            with self._lock:
+                self._replay = None
+            raise
+
+        with self._lock:
+            # An order the snapshot already saw may be counted twice; harmless
+            # for a popularity signal, unlike dropping it until the next rebuild
+            for unique_ids in self._replay:
+                self._fold(matrix, unique_ids)
+            self._matrix = matrix
+            self._top = top
+            self._dirty = set().union(*self._replay)
+            self._replay = None
+            self.built = True
+        return pairs
+
+    def _read_pairs(self, db: Session):
+        matrix: Dict[int, Dict[int, int]] = {}
+        # Archived orders keep their ids, so hot and archived lines never share an
+        # order and each table can be counted on its own (using its order_id index)
+        for line_model in (models.OrderItem, models.ArchivedOrderItem):
+            for product_id, related_id, count in self._pair_counts(db, line_model):
+                row = matrix.setdefault(product_id, {})
+                row[related_id] = row.get(related_id, 0) + count
+        return matrix, sum(len(row) for row in matrix.values())
+
+    @staticmethod
+    def _pair_counts(db: Session, line_model):
+        a = aliased(line_model)
+        b = aliased(line_model)
+        return (
+            db.query(a.product_id, b.product_id, func.count(func.distinct(a.order_id)))
+            .join(b, (a.order_id == b.order_id) & (a.product_id != b.product_id))
+            .group_by(a.product_id, b.product_id)
+            .execution_options(yield_per=REBUILD_FETCH_SIZE)
+        )
+
+    def rebuild_in_new_session(self) -> int:
+        with self._build_lock:
+            db = database.SessionLocal()
+            try:
+                return self.rebuild(db)
+            finally:
+                db.close()
+
+    async def run_rebuilder(self, interval: float = RECOMMENDATIONS_REBUILD_INTERVAL) -> None:
+        """Build now, then rebuild every `interval` seconds, always in a worker thread."""
+        while True:
+            try:
+                await asyncio.to_thread(self.rebuild_in_new_session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error building recommendation index: {e}")
+            await asyncio.sleep(interval)
+
+    def record_order(self, product_ids: Iterable[int]) -> None:
+        """
+        Fold a freshly committed order into the matrix. Only the rows it touches
+        are marked dirty; their top-k lists are recomputed on next lookup.
+        """
+        unique_ids = set(product_ids)
+        if len(unique_ids) < 2:
+            return
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(unique_ids)
+            if self.built:
+                self._fold(self._matrix, unique_ids)
+                self._dirty.update(unique_ids)
+
+    @staticmethod
+    def _fold(matrix: Dict[int, Dict[int, int]], unique_ids: Set[int]) -> None:
+        for product_id in unique_ids:
+            row = matrix.setdefault(product_id, {})
+            for related_id in unique_ids:
+                if related_id != product_id:
+                    row[related_id] = row.get(related_id, 0) + 1
+
+    def remove_product(self, product_id: int) -> None:
+        """Drop a deleted product from its own row and from every related row."""
+        with self._lock:
+            row = self._matrix.pop(product_id, None)
+            self._top.pop(product_id, None)
+            if not row:
+                return
+            for related_id in row:
+                related_row = self._matrix.get(related_id)
+                if related_row is not None and related_row.pop(product_id, None) is not None:
+                    self._dirty.add(related_id)
+
+    def related(self, product_id: int, limit: Optional[int] = None) -> List[int]:
+        """Related product ids for `product_id`, most frequently co-purchased first."""
+        with self._lock:
+            if product_id in self._dirty:
+                self._top[product_id] = self._top_k_for(self._matrix.get(product_id, {}))
+                self._dirty.discard(product_id)
+            ranked = self._top.get(product_id, [])
+        return ranked[:limit] if limit is not None else list(ranked)
+
+    def _top_k_for(self, row: Dict[int, int]) -> List[int]:
+        # Ties are broken by product id so results are stable between rebuilds.
+        best = heapq.nsmallest(self.top_k, row.items(), key=lambda kv: (-kv[1], kv[0]))
+        return [related_id for related_id, _ in best]
+
+
+# Process-wide index used by the API
+index = CoOccurrenceIndex()
@@ -0,0 +1,210 @@
+# ~/ecommerce-platform/throttling.py
+# Login throttling: sliding-window limits per account and per client IP,
+# checked before any database or bcrypt work, plus a negative cache of
+# emails that do not belong to any account.
+#
+# Counters live in process memory by default. Set THROTTLE_REDIS_URL (and
+# install `redis`) to share them between workers and hosts.
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+# --- Configuration ---
+LOGIN_ACCOUNT_LIMIT = int(os.getenv("LOGIN_ACCOUNT_LIMIT", "5"))
+LOGIN_ACCOUNT_WINDOW_SECONDS = int(os.getenv("LOGIN_ACCOUNT_WINDOW_SECONDS", "60"))
+LOGIN_IP_LIMIT = int(os.getenv("LOGIN_IP_LIMIT", "20"))
+LOGIN_IP_WINDOW_SECONDS = int(os.getenv("LOGIN_IP_WINDOW_SECONDS", "60"))
+UNKNOWN_EMAIL_TTL_SECONDS = int(os.getenv("UNKNOWN_EMAIL_TTL_SECONDS", "300"))
+UNKNOWN_EMAIL_MAX_ENTRIES = int(os.getenv("UNKNOWN_EMAIL_MAX_ENTRIES", "100000"))
+THROTTLE_REDIS_URL = os.getenv("THROTTLE_REDIS_URL")
+# Only honour X-Forwarded-For when the API sits behind a trusted proxy.
+# THROTTLE_TRUSTED_PROXIES is how many proxies append to the header in front of
+# the API (e.g. 2 for CDN -> load balancer); the client's address is that many
+# entries from the right. Anything further left is client-controlled.
+THROTTLE_TRUST_FORWARDED = os.getenv("THROTTLE_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+THROTTLE_TRUSTED_PROXIES = max(int(os.getenv("THROTTLE_TRUSTED_PROXIES", "1")), 1)
+_SWEEP_EVERY_HITS = 1000
+
+
+def email_key(email: str) -> str:
+    """
+    Stable, fixed-length key for an email, so raw addresses are never stored.
+    Pass the exact (normalized) string that is looked up in the database, so a
+    negative-cache entry can never cover a different address.
+    """
+    return hashlib.sha256(email.encode()).hexdigest()[:40]
+
+
+class InMemoryBackend:
+    """
+    Sliding-window counters as one small list per key:
+    [window index, hits in current window, hits in previous window, window].
+    Keys idle for two windows are swept automatically.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, List[int]] = {}
+        self._hits = 0
+
+    def hit(self, key: str, window: int, now: float) -> float:
+        index = int(now // window)
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None or entry[0] < index - 1:
+                entry = [index, 0, 0, window]
+            elif entry[0] == index - 1:
+                entry = [index, 0, entry[1], window]
+            entry[1] += 1
+            self._counters[key] = entry
+            self._hits += 1
+            if self._hits % _SWEEP_EVERY_HITS == 0:
+                self._sweep(now)
+        return _estimate(entry[1], entry[2], window, now)
+
+    def reset(self, key: str, window: int) -> None:
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def _sweep(self, now: float) -> None:
+        # An entry two or more of its own windows old counts as zero anyway
+        expired = [k for k, entry in self._counters.items() if entry[0] < int(now // entry[3]) - 1]
+        for k in expired:
+            del self._counters[k]
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+
+class RedisBackend:
+    """Shared counters: one INCR'd key per (key, window index), expiring on its own."""
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("THROTTLE_REDIS_URL is set but the 'redis' package is not installed.")
+        self.client = redis.Redis.from_url(url)
+
+    def hit(self, key: str, window: int, now: float) -> float:
+        index = int(now // window)
+        current_key = f"throttle:{key}:{index}"
+        pipe = self.client.pipeline()
+        pipe.incr(current_key)
+        pipe.expire(current_key, window * 2)
+        pipe.get(f"throttle:{key}:{index - 1}")
+        current, _, previous = pipe.execute()
+        return _estimate(int(current), int(previous or 0), window, now)
+
+    def reset(self, key: str, window: int) -> None:
+        index = int(time.time() // window)
+        self.client.delete(f"throttle:{key}:{index}", f"throttle:{key}:{index - 1}")
+
+    def __len__(self) -> int:
+        return -1  # Not tracked locally
+
+
+def _estimate(current: int, previous: int, window: int, now: float) -> float:
+    """Hits in the last `window` seconds, weighting the previous window by its overlap."""
+    elapsed = (now % window) / window
+    return current + previous * (1 - elapsed)
+
+
+class SlidingWindowLimiter:
+    def __init__(self, name: str, limit: int, window: int, backend):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.backend = backend
+        self.rejected = 0
+
+    def hit(self, key: str) -> Optional[int]:
+        """Count an attempt. Returns seconds to wait if over the limit, else None."""
+        now = time.time()
+        if self.backend.hit(f"{self.name}:{key}", self.window, now) <= self.limit:
+            return None
+        self.rejected += 1
+        return max(1, math.ceil(self.window - (now % self.window)))
+
+    def reset(self, key: str) -> None:
+        self.backend.reset(f"{self.name}:{key}", self.window)
+
+
+class NegativeCache:
+    """Bounded TTL set of email keys known not to have an account."""
+
+    def __init__(self, ttl: int = UNKNOWN_EMAIL_TTL_SECONDS, max_entries: int = UNKNOWN_EMAIL_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+            self.hits += 1
+            return True
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def client_ip(request) -> str:
+    if THROTTLE_TRUST_FORWARDED:
+        # Several X-Forwarded-For headers count as one comma-separated list
+        hops = [
+            hop.strip() for header in request.headers.getlist("x-forwarded-for")
+            for hop in header.split(",") if hop.strip()
+        ]
+        if len(hops) >= THROTTLE_TRUSTED_PROXIES:
+            return hops[-THROTTLE_TRUSTED_PROXIES]
+    return request.client.host if request.client else "unknown"
+
+
+def check_login_allowed(email: str, ip: str) -> Optional[int]:
+    """Count a login attempt against both limits. Returns Retry-After seconds if throttled."""
+    retry_ip = ip_limiter.hit(ip)
+    retry_account = account_limiter.hit(email_key(email))
+    waits = [w for w in (retry_ip, retry_account) if w is not None]
+    return max(waits) if waits else None
+
+
+def snapshot() -> dict:
+    return {
+        "backend": type(_backend).__name__,
+        "tracked_keys": len(_backend),
+        "account": {"limit": account_limiter.limit, "window": account_limiter.window, "rejected": account_limiter.rejected},
+        "ip": {"limit": ip_limiter.limit, "window": ip_limiter.window, "rejected": ip_limiter.rejected},
+        "unknown_emails": {"entries": len(unknown_emails), "hits": unknown_emails.hits},
+    }
+
+
+# Process-wide limiters and cache used by the login endpoint
+_backend = RedisBackend(THROTTLE_REDIS_URL) if THROTTLE_REDIS_URL else InMemoryBackend()
+account_limiter = SlidingWindowLimiter("login-account", LOGIN_ACCOUNT_LIMIT, LOGIN_ACCOUNT_WINDOW_SECONDS, _backend)
+ip_limiter = SlidingWindowLimiter("login-ip", LOGIN_IP_LIMIT, LOGIN_IP_WINDOW_SECONDS, _backend)
+unknown_emails = NegativeCache()